@@ -1,11 +1,15 @@
 import streamlit as antigravity
 import cv2
 import time
+import threading
+import logging
 import numpy as np
 import av
 from streamlit_webrtc import webrtc_streamer, VideoTransformerBase
 from pose_detector import PoseDetector
 
+logger = logging.getLogger(__name__)
+
 # Page Config
 antigravity.set_page_config(
     page_title="PostureGuard",
@@ -21,7 +25,6 @@ if 'smoothing' not in antigravity.session_state:
 
 class VideoProcessor(VideoTransformerBase):
     def __init__(self):
-        self.detector = None
         self.base_angle = None
         self.start_time = None
         self.bad_posture_start_time = None
@@ -34,20 +37,107 @@ class VideoProcessor(VideoTransformerBase):
         self.threshold = 15
         self.smoothing = 5
 
+        # Built by the worker thread; see _inference_loop
+        self.detector = None
+
+        # Pose inference runs in its own thread so the video keeps its frame
+        # rate while pose runs slower. recv hands every infer_interval-th frame
+        # to the worker through a single slot (a frame the worker hasn't
+        # picked up yet is replaced) and overlays the latest result on the
+        # current frame.
+        self.infer_interval = 2
+        self.frame_count = 0
+        self.last_angle = None
+        self.inference_error = False
+        self.latest_frame = None
+        self.frame_lock = threading.Lock()
+        self.frame_ready = threading.Event()
+        self.running = True
+        self.worker = threading.Thread(target=self._inference_loop, daemon=True)
+        self.worker.start()
+
+    def _inference_loop(self):
+        # Build and warm up the detector here rather than in __init__:
+        # streamlit-webrtc constructs the processor while answering the SDP
+        # offer (under a timeout), and this keeps model loading out of both
+        # that and the first frames
+        try:
+            detector = PoseDetector(smoothing_window=self.smoothing)
+            detector.warmup()
+        except Exception:
+            logger.exception("Failed to load the pose detector")
+            self.inference_error = True
+            return
+        self.detector = detector
+
+        while self.running:
+            if not self.frame_ready.wait(timeout=0.5):
+                continue
+            with self.frame_lock:
+                img = self.latest_frame
+                self.latest_frame = None
+                self.frame_ready.clear()
+            if img is None:
+                continue
+
+            try:
+                # Pick up Smoothing Window changes injected from main()
+                if self.detector.smoothing_window != self.smoothing:
+                    self.detector.set_smoothing_window(self.smoothing)
+
+                # Detect
+                landmarks, _ = self.detector.detect(img, draw=False)
+                
+                # Calculate Angle
+                raw_angle = self.detector.calculate_angle(landmarks)
+                self.last_angle = self.detector.get_smoothed_angle(raw_angle)
+                self.inference_error = False
+            except Exception:
+                # Don't let the thread die silently with a stale angle; recv
+                # shows the error until a later frame succeeds
+                logger.exception("Pose inference failed")
+                self.last_angle = None
+                self.detector.pose_landmarks = None
+                self.inference_error = True
+
+    def on_ended(self):
+        self.running = False
+        self.frame_ready.set()
+
     def recv(self, frame):
         img = frame.to_ndarray(format="bgr24")
-        
-        # Initialize detector lazily to ensure it's in the right thread/process context if needed
+
+        # Wait for the worker to finish loading the model before calibrating
         if self.detector is None:
-            self.detector = PoseDetector(smoothing_window=self.smoothing)
+            processed_frame = img
+            h, w, _ = processed_frame.shape
+            cv2.rectangle(processed_frame, (0, 0), (w, 80), (0, 0, 0), -1) # Top banner
+            if self.inference_error:
+                cv2.putText(processed_frame, "Model failed to load. See logs.", (20, 50),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            else:
+                cv2.putText(processed_frame, "LOADING MODEL...", (20, 50),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+            return av.VideoFrame.from_ndarray(processed_frame, format="bgr24")
+
+        # Calibration starts with the first frame after the model is ready
+        if self.start_time is None:
             self.start_time = time.time()
 
-        # Detect
-        landmarks, processed_frame = self.detector.detect(img)
-        
-        # Calculate Angle
-        raw_angle = self.detector.calculate_angle(landmarks)
-        smoothed_angle = self.detector.get_smoothed_angle(raw_angle)
+        # Hand every infer_interval-th frame to the worker. It gets its own
+        # array (the downscaled frame, or a copy if no downscale happened) so
+        # the overlay can be drawn on img directly
+        if self.frame_count % self.infer_interval == 0:
+            pose_input = self.detector.downscale(img)
+            if pose_input is img:
+                pose_input = img.copy()
+            with self.frame_lock:
+                self.latest_frame = pose_input
+                self.frame_ready.set()
+        self.frame_count += 1
+
+        processed_frame = self.detector.draw_landmarks(img)
+        smoothed_angle = self.last_angle
         
         current_time = time.time()
         elapsed = current_time - self.start_time
@@ -55,6 +145,13 @@ class VideoProcessor(VideoTransformerBase):
         # Overlay Info Box
         h, w, _ = processed_frame.shape
         cv2.rectangle(processed_frame, (0, 0), (w, 80), (0, 0, 0), -1) # Top banner
+
+        # Pose inference is failing; don't report a posture verdict
+        if self.inference_error:
+            self.bad_posture_start_time = None
+            cv2.putText(processed_frame, "POSE ERROR - see logs", (20, 50),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            return av.VideoFrame.from_ndarray(processed_frame, format="bgr24")
         
         # Calibration Phase
         if elapsed < self.calibration_duration:
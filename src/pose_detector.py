@@ -1,62 +1,133 @@
+from collections import deque
+from math import atan2, degrees
 import mediapipe as mp
 import cv2
 import numpy as np
 
+# MediaPipe Pose landmarks and threshold used for the posture angle
+LEFT_EAR = mp.solutions.pose.PoseLandmark.LEFT_EAR
+LEFT_SHOULDER = mp.solutions.pose.PoseLandmark.LEFT_SHOULDER
+VISIBILITY_THRESHOLD = 0.5
+
 class PoseDetector:
-    def __init__(self, smoothing_window=5):
+    def __init__(self, smoothing_window=5, max_input_size=640):
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose(
             static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
+            # Lite model is enough for the ear/shoulder landmarks we use, and the
+            # angle is already smoothed in get_smoothed_angle
+            model_complexity=0,
+            smooth_landmarks=False,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
         self.mp_drawing = mp.solutions.drawing_utils
-        self.angle_history = []
+        self.pose_landmarks = None
+        self.angle_history = deque(maxlen=smoothing_window)
+        self.angle_sum = 0.0
         self.smoothing_window = smoothing_window
+        # MediaPipe resizes to its own ~256px input anyway, so larger frames
+        # are shrunk before the color conversion to save bandwidth.
+        self.max_input_size = max_input_size
+        # Reused RGB buffer so the color conversion doesn't allocate a new image every frame
+        self.rgb_buffer = None
 
-    def detect(self, frame):
+    def warmup(self, height=480, width=640):
+        """
+        Runs one inference on a blank frame so MediaPipe's graph setup and the
+        person-detection model run before the first real frame arrives.
+        A blank frame never yields a detection, so the landmark model is not
+        invoked here and its first-run cost still lands on the first frame
+        that contains a person.
+        """
+        self.pose.process(np.zeros((height, width, 3), dtype=np.uint8))
+
+    def detect(self, frame, draw=True):
         """
         Processes the frame and returns landmarks and the processed image.
+        draw=True keeps detect() usable as a single call that also draws the
+        skeleton; pass draw=False when drawing is done separately with
+        draw_landmarks() (the frame is then returned untouched).
+        Landmarks are a tuple (ear_x, ear_y, ear_visibility, shoulder_x,
+        shoulder_y, shoulder_visibility) for the left side, or None if no pose
+        was found.
         """
-        # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Downscale large frames (landmarks are normalized, so drawing on the
+        # full-size frame is unaffected)
+        image = self.downscale(frame)
+
+        # Convert BGR to RGB into the reused buffer (MediaPipe copies its input,
+        # so overwriting it next frame is safe)
+        if self.rgb_buffer is None or self.rgb_buffer.shape != image.shape:
+            self.rgb_buffer = np.empty_like(image)
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
         results = self.pose.process(image_rgb)
+        self.pose_landmarks = results.pose_landmarks
         
         # Draw landmarks on the frame (for visualization)
-        if results.pose_landmarks:
+        if draw:
+            frame = self.draw_landmarks(frame)
+
+        if not results.pose_landmarks:
+            return None, frame
+
+        # Read only the fields calculate_angle needs out of the protobuf, once
+        l_ear = results.pose_landmarks.landmark[LEFT_EAR]
+        l_shoulder = results.pose_landmarks.landmark[LEFT_SHOULDER]
+        landmarks = (
+            l_ear.x, l_ear.y, l_ear.visibility,
+            l_shoulder.x, l_shoulder.y, l_shoulder.visibility
+        )
+            
+        return landmarks, frame
+
+    def downscale(self, frame):
+        """
+        Returns a new frame shrunk to max_input_size on its longer side,
+        or the frame itself if it is already small enough.
+        """
+        h, w = frame.shape[:2]
+        scale = self.max_input_size / max(h, w)
+        if scale < 1.0:
+            return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        return frame
+
+    def draw_landmarks(self, frame):
+        """
+        Draws the most recently detected landmarks on the frame.
+        Lets the caller overlay the latest result on a frame other than the
+        one detect() ran on (e.g. when inference runs in another thread).
+        """
+        if self.pose_landmarks:
             self.mp_drawing.draw_landmarks(
                 frame,
-                results.pose_landmarks,
+                self.pose_landmarks,
                 self.mp_pose.POSE_CONNECTIONS
             )
             
-        return results.pose_landmarks, frame
+        return frame
 
     def calculate_angle(self, landmarks):
         """
-        Calculates the angle of the ear-shoulder vector relative to the vertical axis.
+        Calculates the angle of the ear-shoulder vector relative to the vertical axis
+        from the landmark tuple returned by detect().
         Returns the angle in degrees.
         """
-        if not landmarks:
+        if landmarks is None:
             return None
 
-        # Get coordinates for left ear (7) and left shoulder (11)
-        # We can also use right side (8, 12) or average them. 
-        # For simplicity, let's use the side that is more visible or just Left for MVP.
-        # Let's use Left side: Ear(7), Shoulder(11)
-        l_ear = landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_EAR]
-        l_shoulder = landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_SHOULDER]
+        # detect() returns the fields for LEFT_EAR and LEFT_SHOULDER.
+        # The right side could be used instead, or both averaged.
+        ear_x, ear_y, ear_vis, sh_x, sh_y, sh_vis = landmarks
         
         # Check visibility
-        if l_ear.visibility < 0.5 or l_shoulder.visibility < 0.5:
+        if ear_vis < VISIBILITY_THRESHOLD or sh_vis < VISIBILITY_THRESHOLD:
             return None
 
         # Vector: Shoulder -> Ear (Upwards is expected)
         # Y axis increases downwards in image coordinates.
-        dy = l_ear.y - l_shoulder.y
-        dx = l_ear.x - l_shoulder.x
+        dy = ear_y - sh_y
+        dx = ear_x - sh_x
         
         # Calculate angle with respect to vertical (negative Y axis)
         # Vertical vector is (0, -1)
@@ -65,11 +136,19 @@ class PoseDetector:
         # But in image coords, Up is negative Y. So (shoulder.y - ear.y) is positive distance.
         
         # Let's simplify: Just get the absolute angle of the vector from vertical.
-        angle_rad = np.arctan2(dx, -dy) # -dy to flip Y axis for standard math
-        angle_deg = np.degrees(angle_rad)
+        angle_rad = atan2(dx, -dy) # -dy to flip Y axis for standard math
+        angle_deg = degrees(angle_rad)
         
         return abs(angle_deg)
 
+    def set_smoothing_window(self, smoothing_window):
+        """
+        Changes the moving-average window, keeping the most recent angles.
+        """
+        self.angle_history = deque(self.angle_history, maxlen=smoothing_window)
+        self.angle_sum = sum(self.angle_history)
+        self.smoothing_window = smoothing_window
+
     def get_smoothed_angle(self, current_angle):
         """
         Returns the moving average of the angle.
@@ -77,11 +156,14 @@ class PoseDetector:
         if current_angle is None:
             return None
             
+        # Running sum over a fixed-size window: drop the oldest value
+        # before the deque evicts it
+        if len(self.angle_history) == self.angle_history.maxlen:
+            self.angle_sum -= self.angle_history[0]
         self.angle_history.append(current_angle)
-        if len(self.angle_history) > self.smoothing_window:
-            self.angle_history.pop(0)
+        self.angle_sum += current_angle
             
-        return np.mean(self.angle_history)
+        return self.angle_sum / len(self.angle_history)
 
     def is_bad_posture(self, current_angle, base_angle, threshold=15):
         """